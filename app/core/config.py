@@ -1,3 +1,4 @@
+from functools import lru_cache
 from pathlib import Path
 
 from pydantic import field_validator
@@ -23,5 +24,7 @@ class Settings(BaseSettings):
         return v.strip() if isinstance(v, str) else v
 
 
-settings = Settings()
-
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Get application settings (cached singleton, env parsed on first use)."""
+    return Settings()
@@ -1,34 +1,55 @@
 import logging
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse, ORJSONResponse
 
-from app.core.config import settings
+from app.core.config import get_settings
 from app.routes import chat, generate, recommend
+from app.services.firestore_client import get_async_db
+from app.services.openai_client import close_openai, is_invalid_header_error
 
-app = FastAPI(title='AI Content Service')
 
-app.include_router(generate.router)
-app.include_router(recommend.router)
-app.include_router(chat.router)
-
-
-@app.on_event("startup")
 def validate_api_key():
     """Check API key format at startup - log warning if suspicious."""
-    key = settings.OPENAI_API_KEY
+    key = get_settings().OPENAI_API_KEY
     if "\n" in key or "\r" in key:
         logging.warning("OPENAI_API_KEY contains newline/carriage return - this will cause requests to fail")
     if not key.startswith("sk-"):
         logging.warning("OPENAI_API_KEY does not start with sk- - may be invalid")
 
 
+def warm_up_clients():
+    """Create the cached Firestore client before the first request needs it."""
+    try:
+        get_async_db()
+    except Exception as e:
+        logging.warning("Firestore client warm-up failed: %s", e)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Run startup checks and warm clients before the server accepts traffic."""
+    validate_api_key()
+    warm_up_clients()
+    yield
+    await close_openai()
+
+
+app = FastAPI(title='AI Content Service', default_response_class=ORJSONResponse, lifespan=lifespan)
+app.add_middleware(GZipMiddleware, minimum_size=512, compresslevel=5)
+
+app.include_router(generate.router)
+app.include_router(recommend.router)
+app.include_router(chat.router)
+
+
 @app.exception_handler(Exception)
 async def catch_all_handler(request: Request, exc: Exception):
     """Catch any unhandled exception and return 503 instead of 500."""
     logging.exception("Unhandled exception: %s", exc)
-    err = str(exc).lower()
-    if "illegal header" in err or "header value" in err:
+    if is_invalid_header_error(exc):
         return JSONResponse(
             status_code=503,
             content={"detail": "API key has invalid characters (e.g. newline). Re-add secret with: echo -n 'sk-...' | gcloud secrets versions add openai-api-key --data-file=-"},
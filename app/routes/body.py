@@ -0,0 +1,36 @@
+"""
+msgspec request/response handling for hot routes.
+These routes skip FastAPI's pydantic pass; the pydantic models still document them in OpenAPI.
+"""
+from typing import TypeVar
+
+import msgspec
+from fastapi import HTTPException, Request, Response
+from pydantic import BaseModel
+
+T = TypeVar("T")
+
+
+async def decode_body(request: Request, type_: type[T]) -> T:
+    """Decode and validate the JSON request body as a msgspec Struct. Raises 422 on bad input."""
+    try:
+        return msgspec.json.decode(await request.body(), type=type_)
+    except msgspec.ValidationError as e:
+        raise HTTPException(status_code=422, detail=str(e)) from e
+    except msgspec.DecodeError as e:
+        raise HTTPException(status_code=422, detail="Request body is not valid JSON") from e
+
+
+def json_response(content) -> Response:
+    """Encode content with msgspec into a JSON response."""
+    return Response(msgspec.json.encode(content), media_type="application/json")
+
+
+def openapi_body(model: type[BaseModel]) -> dict:
+    """openapi_extra documenting a JSON request body with a pydantic model."""
+    return {
+        "requestBody": {
+            "content": {"application/json": {"schema": model.model_json_schema()}},
+            "required": True,
+        }
+    }
@@ -1,29 +1,71 @@
 """AI chat support API routes."""
-from fastapi import APIRouter, HTTPException
+from contextlib import aclosing
 
-from app.schema.chat import ChatRequest, ChatResponse
-from app.services.chat_service import chat
+import orjson
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+
+from app.routes.body import decode_body, json_response, openapi_body
+from app.schema.chat import ChatRequest, ChatRequestMsg, ChatResponse
+from app.services.chat_service import ChatStreamInterrupted, chat, chat_stream
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 
 
-@router.post("", response_model=ChatResponse, summary="Send a chat message")
-def chat_endpoint(req: ChatRequest) -> ChatResponse:
+@router.post(
+    "",
+    summary="Send a chat message",
+    responses={200: {"model": ChatResponse}},
+    openapi_extra=openapi_body(ChatRequest),
+)
+async def chat_endpoint(request: Request) -> Response:
     """
     Send a message to the AI support assistant. Returns a helpful reply.
     Optionally provide user_id, event_id, user_type for personalized context.
     """
+    # Hot path: msgspec decodes/validates the body and encodes the reply
+    req = await decode_body(request, ChatRequestMsg)
     try:
-        result = chat(
+        result = await chat(
             message=req.message,
             user_id=req.user_id,
             event_id=req.event_id,
             user_type=req.user_type,
             language=req.language,
         )
-        return ChatResponse(**result)
+        return json_response(result)
     except Exception as e:
         raise HTTPException(
             status_code=503,
             detail="Chat service temporarily unavailable. Please try again.",
         ) from e
+
+
+@router.post("/stream", summary="Stream a chat reply")
+async def chat_stream_endpoint(req: ChatRequest) -> StreamingResponse:
+    """
+    Same as POST /chat, but streams the reply as server-sent events so clients
+    can render it as it is generated. Each event is `data: {"delta": "..."}`;
+    the stream ends with `data: [DONE]`. If generation fails mid-reply, the stream
+    ends with `event: error` instead, and the partial reply should be discarded.
+    """
+    deltas = chat_stream(
+        message=req.message,
+        user_id=req.user_id,
+        event_id=req.event_id,
+        user_type=req.user_type,
+        language=req.language,
+    )
+
+    async def events():
+        # aclosing: a client disconnect also closes chat_stream and its upstream stream
+        async with aclosing(deltas):
+            try:
+                async for delta in deltas:
+                    yield b"data: " + orjson.dumps({"delta": delta}) + b"\n\n"
+            except ChatStreamInterrupted:
+                yield b"event: error\ndata: " + orjson.dumps({"error": "Reply interrupted. Please try again."}) + b"\n\n"
+                return
+        yield b"data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
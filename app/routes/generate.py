@@ -1,13 +1,16 @@
 import logging
 
 import httpx
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request, Response
+from openai import APIConnectionError, AuthenticationError, RateLimitError
 
-from app.core.config import settings
+from app.core.config import get_settings
+from app.routes.body import decode_body, json_response, openapi_body
 from app.schema.event import (
     DescriptionInput,
     EventInput,
     FormAssistInput,
+    FormAssistInputMsg,
     PoliciesInput,
     TagsInput,
 )
@@ -17,19 +20,20 @@ from app.services.ai_generator import (
     generate_policies,
     generate_tags,
 )
+from app.services.openai_client import InvalidAPIKeyError, is_invalid_header_error
 
 router = APIRouter(prefix="/ai")
 
 
 @router.get("/health")
-def health_check():
+async def health_check():
     return {"status": "ok"}
 
 
 @router.get("/status")
-def status_check():
+async def status_check():
     """Check if API key format is valid (does not expose the key)."""
-    key = settings.OPENAI_API_KEY
+    key = get_settings().OPENAI_API_KEY
     has_newline = "\n" in key or "\r" in key
     return {
         "status": "ok",
@@ -38,38 +42,49 @@ def status_check():
 
 
 @router.post("/generate", summary="Generate description (legacy)")
-def generate_legacy(data: EventInput):
+async def generate_legacy(data: EventInput):
     """Legacy endpoint: generates description from title, city, category."""
-    return generate_description(data)
+    return await generate_description(data)
 
 
 @router.post("/generate/description", summary="Generate event description")
-def generate_description_endpoint(data: DescriptionInput):
+async def generate_description_endpoint(data: DescriptionInput):
     """Generate a captivating event description. Supports venue, eventType, language."""
-    return generate_description(data)
+    return await generate_description(data)
 
 
 @router.post("/generate/tags", summary="Suggest tags")
-def generate_tags_endpoint(data: TagsInput):
+async def generate_tags_endpoint(data: TagsInput):
     """Generate relevant tags for discovery and search."""
-    return generate_tags(data)
+    return await generate_tags(data)
 
 
 @router.post("/generate/policies", summary="Generate policy templates")
-def generate_policies_endpoint(data: PoliciesInput):
+async def generate_policies_endpoint(data: PoliciesInput):
     """Generate refund and cancellation policy templates."""
-    return generate_policies(data)
+    return await generate_policies(data)
 
 
-@router.post("/generate/form-assist", summary="Form assist (combined)")
-def generate_form_assist_endpoint(data: FormAssistInput):
+@router.post(
+    "/generate/form-assist",
+    summary="Form assist (combined)",
+    openapi_extra=openapi_body(FormAssistInput),
+)
+async def generate_form_assist_endpoint(request: Request) -> Response:
     """Generate description, tags, suggested venue, and policies in one call."""
+    # Hot path: msgspec decodes/validates the body and encodes the result
+    data = await decode_body(request, FormAssistInputMsg)
     try:
-        return generate_form_assist(data)
-    except httpx.HTTPError as e:
+        return json_response(await generate_form_assist(data))
+    except AuthenticationError as e:
+        logging.exception("Form assist failed: %s", e)
+        raise HTTPException(status_code=503, detail="AI service misconfigured. Check OPENAI_API_KEY.")
+    except RateLimitError as e:
+        logging.exception("Form assist failed: %s", e)
+        raise HTTPException(status_code=503, detail="AI service temporarily unavailable. Try again later.")
+    except (httpx.HTTPError, APIConnectionError, InvalidAPIKeyError) as e:
         logging.exception("Form assist HTTP error: %s", e)
-        err = str(e).lower()
-        if "illegal header" in err or "header value" in err or "\\n" in repr(e):
+        if is_invalid_header_error(e):
             raise HTTPException(
                 status_code=503,
                 detail="API key invalid (trailing newline?). Update openai-api-key in Secret Manager with: echo -n 'sk-...' | gcloud secrets versions add openai-api-key --data-file=-",
@@ -77,9 +92,4 @@ def generate_form_assist_endpoint(data: FormAssistInput):
         raise HTTPException(status_code=503, detail="AI service connection error. Please try again.")
     except Exception as e:
         logging.exception("Form assist failed: %s", e)
-        err = str(e).lower()
-        if "api_key" in err or "authentication" in err:
-            raise HTTPException(status_code=503, detail="AI service misconfigured. Check OPENAI_API_KEY.")
-        if "rate" in err or "quota" in err:
-            raise HTTPException(status_code=503, detail="AI service temporarily unavailable. Try again later.")
         raise HTTPException(status_code=503, detail="AI service error. Please try again later.")
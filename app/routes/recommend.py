@@ -1,13 +1,15 @@
 """API routes for event recommendations."""
-from fastapi import APIRouter, HTTPException, Query
+import orjson
+from fastapi import APIRouter, HTTPException, Query, Response
 
+from app.services.firestore_client import firestore_json_default
 from app.services.recommender import recommend_events
 
 router = APIRouter(prefix="/recommendations", tags=["recommendations"])
 
 
 @router.get("", summary="Get recommended events")
-def get_recommendations(
+async def get_recommendations(
     user_id: str | None = Query(None, description="User ID for personalized recommendations (optional)"),
     limit: int = Query(10, ge=1, le=50, description="Max number of events to return"),
 ):
@@ -16,6 +18,8 @@ def get_recommendations(
     userInterestProfiles exists. Otherwise returns trending events from eventAnalytics.
     """
     try:
-        return recommend_events(user_id=user_id, limit=limit)
+        result = await recommend_events(user_id=user_id, limit=limit)
     except Exception as e:
         raise HTTPException(status_code=503, detail=f"Recommendation service unavailable: {str(e)}")
+    # Encode raw Firestore values in one orjson pass, skipping jsonable_encoder
+    return Response(orjson.dumps(result, default=firestore_json_default), media_type="application/json")
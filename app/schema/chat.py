@@ -1,24 +1,37 @@
 """Chat API schemas."""
-from typing import Literal, Optional
+from typing import Annotated, Literal
 
-from pydantic import BaseModel, Field
+import msgspec
+from pydantic import BaseModel, ConfigDict, Field
 
 
 class ChatRequest(BaseModel):
     """Request to send a chat message."""
 
+    model_config = ConfigDict(frozen=True)
     message: str = Field(..., min_length=1, max_length=2000)
-    user_id: Optional[str] = Field(None, description="User ID for personalization and context")
-    event_id: Optional[str] = Field(None, description="Current event context (if user is viewing an event)")
-    user_type: Optional[Literal["attendee", "organizer"]] = Field(
+    user_id: str | None = Field(None, description="User ID for personalization and context")
+    event_id: str | None = Field(None, description="Current event context (if user is viewing an event)")
+    user_type: Literal["attendee", "organizer"] | None = Field(
         None, description="attendee or organizer for tailored support"
     )
-    conversation_id: Optional[str] = Field(None, description="For threading (future use)")
-    language: Optional[str] = Field("fr", description="Preferred response language (fr, en)")
+    conversation_id: str | None = Field(None, description="For threading (future use)")
+    language: str | None = Field("fr", description="Preferred response language (fr, en)")
 
 
 class ChatResponse(BaseModel):
     """Response from the chat service."""
 
     reply: str
-    conversation_id: Optional[str] = None
+    conversation_id: str | None = None
+
+
+class ChatRequestMsg(msgspec.Struct, kw_only=True, frozen=True):
+    """msgspec mirror of ChatRequest, decoded directly on the hot POST /chat path."""
+
+    message: Annotated[str, msgspec.Meta(min_length=1, max_length=2000)]
+    user_id: str | None = None
+    event_id: str | None = None
+    user_type: Literal["attendee", "organizer"] | None = None
+    conversation_id: str | None = None
+    language: str | None = "fr"
@@ -1,17 +1,16 @@
-from typing import Optional
-
+import msgspec
 from pydantic import BaseModel, ConfigDict, Field
 
 
 class DescriptionInput(BaseModel):
-    model_config = ConfigDict(populate_by_name=True)
+    model_config = ConfigDict(populate_by_name=True, frozen=True)
     title: str
     city: str
     category: str
-    venue: Optional[str] = None
-    event_type: Optional[str] = Field(None, alias="eventType")
-    language: Optional[str] = "fr"
-    max_length: Optional[int] = Field(500, alias="maxLength")
+    venue: str | None = None
+    event_type: str | None = Field(None, alias="eventType")
+    language: str | None = "fr"
+    max_length: int | None = Field(500, alias="maxLength")
 
 
 class DescriptionOutput(BaseModel):
@@ -19,10 +18,10 @@ class DescriptionOutput(BaseModel):
 
 
 class TagsInput(BaseModel):
-    model_config = ConfigDict(populate_by_name=True)
+    model_config = ConfigDict(populate_by_name=True, frozen=True)
     title: str
     category: str
-    city: Optional[str] = None
+    city: str | None = None
 
 
 class TagsOutput(BaseModel):
@@ -30,10 +29,10 @@ class TagsOutput(BaseModel):
 
 
 class PoliciesInput(BaseModel):
-    model_config = ConfigDict(populate_by_name=True)
-    event_type: Optional[str] = Field("paid", alias="eventType")
-    currency: Optional[str] = "CDF"
-    language: Optional[str] = "fr"
+    model_config = ConfigDict(populate_by_name=True, frozen=True)
+    event_type: str | None = Field("paid", alias="eventType")
+    currency: str | None = "CDF"
+    language: str | None = "fr"
 
 
 class PoliciesOutput(BaseModel):
@@ -42,18 +41,27 @@ class PoliciesOutput(BaseModel):
 
 
 class FormAssistInput(BaseModel):
-    model_config = ConfigDict(populate_by_name=True)
+    model_config = ConfigDict(populate_by_name=True, frozen=True)
+    title: str
+    category: str
+    city: str | None = None
+    venue: str | None = None
+    language: str | None = "fr"
+
+
+class FormAssistInputMsg(msgspec.Struct, kw_only=True, frozen=True):
+    """msgspec mirror of FormAssistInput, decoded directly on the hot form-assist path."""
     title: str
     category: str
-    city: Optional[str] = None
-    venue: Optional[str] = None
-    language: Optional[str] = "fr"
+    city: str | None = None
+    venue: str | None = None
+    language: str | None = "fr"
 
 
 class FormAssistOutput(BaseModel):
     description: str
     tags: list[str]
-    suggested_venue: Optional[str] = Field(None, alias="suggestedVenue")
+    suggested_venue: str | None = Field(None, alias="suggestedVenue")
     refund_policy: str = Field(..., alias="refundPolicy")
     cancellation_policy: str = Field(..., alias="cancellationPolicy")
 
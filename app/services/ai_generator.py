@@ -1,14 +1,25 @@
-import json
+import re
 
-from app.services.openai_client import client
+import orjson
 
-# Supported languages for prompts
-LANGUAGES = {"fr": "French", "en": "English", "sw": "Swahili"}
+from app.services.languages import language_name
+from app.services.openai_client import get_openai
 
+# Body of a ```json ... ``` block the model sometimes wraps its output in
+_FENCE = re.compile(r"```(?:\w+)?\n?(.*?)```", re.DOTALL)
 
-def generate_description(data) -> dict:
+
+def _strip_fence(text: str) -> str:
+    """Return the content of a markdown code fence, or text unchanged if there is none."""
+    if "```" not in text:
+        return text
+    m = _FENCE.search(text)
+    return m.group(1).strip() if m else text
+
+
+async def generate_description(data) -> dict:
     """Generate a captivating event description."""
-    language = LANGUAGES.get(getattr(data, "language", None) or "fr", "French")
+    language = language_name(getattr(data, "language", None))
     venue = getattr(data, "venue", None)
     event_type = getattr(data, "event_type", None)
     max_len = getattr(data, "max_length", None) or 500
@@ -27,12 +38,15 @@ Requirements:
 - Highlight what makes this event special
 - Use a tone that excites attendees"""
 
-    response = client.chat.completions.create(
+    response = await get_openai().chat.completions.create(
         model="gpt-4o-mini",
         messages=[
             {"role": "system", "content": "You are a marketing expert for events in Africa. Write concise, engaging descriptions."},
             {"role": "user", "content": prompt},
         ],
+        # ~4 chars per token, plus headroom for the model overshooting; clamped so
+        # an extreme maxLength can't produce a value the API rejects
+        max_tokens=min(max(120 + max_len // 4, 16), 1024),
     )
 
     description = response.choices[0].message.content
@@ -42,47 +56,50 @@ Requirements:
     return {"description": description}
 
 
-def generate_tags(data) -> dict:
+async def generate_tags(data) -> dict:
     """Generate relevant tags for an event."""
     city_part = f" in {data.city}" if data.city else ""
 
-    prompt = f"""Suggest 5-8 relevant tags for this event. Return ONLY a JSON array of strings, nothing else.
+    prompt = f"""Suggest 5-8 relevant tags for this event. Return ONLY a JSON object of the form {{"tags": ["...", "..."]}}, nothing else.
 
 Event: {data.title}
 Category: {data.category}{city_part}
 
 Tags should be: lowercase, comma-separated in the array, relevant for search/discovery, mix of generic (concert, live music) and specific (city name, genre)."""
 
-    response = client.chat.completions.create(
+    response = await get_openai().chat.completions.create(
         model="gpt-4o-mini",
         messages=[
-            {"role": "system", "content": "You return only valid JSON arrays of tag strings. No extra text."},
+            {"role": "system", "content": "You return only a valid JSON object with a tags array of tag strings. No extra text."},
             {"role": "user", "content": prompt},
         ],
+        max_tokens=256,
+        response_format={"type": "json_object"},
     )
 
     content = response.choices[0].message.content
+    if content is None:
+        return {"tags": []}
     try:
         # Extract array if model wrapped it in markdown
-        text = content.strip()
-        if text.startswith("```"):
-            lines = text.split("\n")
-            text = "\n".join(lines[1:-1]) if len(lines) > 2 else text
-        tags = json.loads(text)
+        text = _strip_fence(content.strip())
+        obj = orjson.loads(text)
+        tags = obj.get("tags") if isinstance(obj, dict) else obj
         if isinstance(tags, list):
             tags = [str(t).strip().lower() for t in tags if t][:8]
         else:
             tags = []
-    except (json.JSONDecodeError, TypeError):
-        # Fallback: split by comma
-        tags = [t.strip().lower() for t in content.split(",") if t.strip()][:8]
+    except (orjson.JSONDecodeError, TypeError, AttributeError):
+        # JSON mode guarantees JSON, so a parse failure means a truncated reply -
+        # splitting it would return fragments of raw JSON as tags
+        tags = []
 
     return {"tags": tags}
 
 
-def generate_policies(data) -> dict:
+async def generate_policies(data) -> dict:
     """Generate refund and cancellation policy templates."""
-    language = LANGUAGES.get(getattr(data, "language", None) or "fr", "French")
+    language = language_name(getattr(data, "language", None))
     currency = getattr(data, "currency", None) or "CDF"
     event_type = getattr(data, "event_type", None) or "paid"
 
@@ -94,34 +111,32 @@ def generate_policies(data) -> dict:
 Return strictly in this JSON format:
 {{"refundPolicy": "...", "cancellationPolicy": "..."}}"""
 
-    response = client.chat.completions.create(
+    response = await get_openai().chat.completions.create(
         model="gpt-4o-mini",
         messages=[
             {"role": "system", "content": "You return only valid JSON with refundPolicy and cancellationPolicy keys."},
             {"role": "user", "content": prompt},
         ],
+        max_tokens=600,
+        response_format={"type": "json_object"},
     )
 
     content = response.choices[0].message.content
     try:
-        text = content.strip()
-        if "```" in text:
-            start = text.find("[") if "[" in text else text.find("{")
-            end = text.rfind("]") + 1 if "]" in text else text.rfind("}") + 1
-            text = text[start:end]
-        obj = json.loads(text)
+        text = _strip_fence(content.strip())
+        obj = orjson.loads(text)
         refund = obj.get("refundPolicy", "").strip()
         cancellation = obj.get("cancellationPolicy", "").strip()
-    except (json.JSONDecodeError, TypeError, AttributeError):
+    except (orjson.JSONDecodeError, TypeError, AttributeError):
         refund = "Contact the organizer for refund conditions."
         cancellation = "In case of cancellation, attendees will be notified and refunded according to our refund policy."
 
     return {"refundPolicy": refund, "cancellationPolicy": cancellation}
 
 
-def generate_form_assist(data) -> dict:
+async def generate_form_assist(data) -> dict:
     """Generate all form fields in one call: description, tags, venue, policies."""
-    language = LANGUAGES.get(data.language or "fr", "French")
+    language = language_name(data.language)
     city_part = f" in {data.city}" if data.city else ""
     venue_part = f" at {data.venue}" if data.venue else ""
 
@@ -139,22 +154,20 @@ Return a JSON object with exactly these keys:
 
 Return ONLY valid JSON, no extra text."""
 
-    response = client.chat.completions.create(
+    response = await get_openai().chat.completions.create(
         model="gpt-4o-mini",
         messages=[
             {"role": "system", "content": "You return only valid JSON. No markdown, no explanation."},
             {"role": "user", "content": prompt},
         ],
+        max_tokens=1200,
+        response_format={"type": "json_object"},
     )
 
     content = response.choices[0].message.content
     try:
-        text = content.strip()
-        if "```" in text:
-            start = max(text.find("{"), 0)
-            end = text.rfind("}") + 1
-            text = text[start:end]
-        obj = json.loads(text)
+        text = _strip_fence(content.strip())
+        obj = orjson.loads(text)
         description = str(obj.get("description", ""))[:500]
         tags = obj.get("tags", [])
         if not isinstance(tags, list):
@@ -165,7 +178,7 @@ Return ONLY valid JSON, no extra text."""
             suggested_venue = str(suggested_venue).strip() or None
         refund = str(obj.get("refundPolicy", ""))[:500]
         cancellation = str(obj.get("cancellationPolicy", ""))[:500]
-    except (json.JSONDecodeError, TypeError, AttributeError):
+    except (orjson.JSONDecodeError, TypeError, AttributeError):
         # Fallback partial generation
         description = f"{data.title} - {data.category}{city_part}. Don't miss it!"
         tags = [data.category, "event"]
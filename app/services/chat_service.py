@@ -3,170 +3,313 @@ AI chat support service for BissoEvent.
 Answers questions about events, tickets, payments, refunds.
 Uses Firestore for context (user, event, tickets).
 """
+import asyncio
 import logging
-from datetime import datetime, timezone
-from typing import Any, Optional
+from datetime import datetime
+from functools import lru_cache
+from typing import AsyncIterator
 
-from app.services.firestore_client import get_db
-from app.services.openai_client import client
+from cachetools import TTLCache
+
+from app.services.firestore_client import get_async_db
+from app.services.languages import LANGUAGES, language_name
+from app.services.openai_client import get_openai
+from app.services.singleflight import SingleFlight
 
 logger = logging.getLogger(__name__)
 
-LANGUAGES = {"fr": "French", "en": "English"}
+_SYSTEM_PROMPT = """Tu es l'assistant de support de BissoEvent, une application de billetterie et d'événements en Afrique (RD Congo, Congo, etc.).
 
+Réponds TOUJOURS en {lang_name}.
 
-def _serialize_val(val: Any) -> Any:
-    """Convert Firestore values to JSON-serializable."""
-    if val is None:
-        return None
-    if hasattr(val, "isoformat"):
-        return val.isoformat()
-    if hasattr(val, "timestamp"):
-        return datetime.fromtimestamp(val.timestamp(), tz=timezone.utc).isoformat()
-    if isinstance(val, dict):
-        return {k: _serialize_val(v) for k, v in val.items()}
-    if isinstance(val, list):
-        return [_serialize_val(v) for v in val]
-    return val
+Tu peux aider sur:
+- Réservation de billets, paiement (Mobile Money, carte)
+- Remboursements et annulations (politiques de l'événement)
+- Informations sur les événements (date, lieu, prix)
+- Compte organisateur (création d'événements, ventes)
+- Problèmes techniques (application, QR codes)
 
+Si tu ne connais pas la réponse ou si c'est hors de ton scope (ex: litige juridique), dis poliment de contacter le support: support@bissoevent.com ou via l'app.
 
-def _get_user_context(user_id: Optional[str]) -> str:
-    """Fetch user profile for context."""
-    if not user_id:
-        return ""
+Sois concis, utile et courtois. Maximum 3-4 phrases sauf si l'utilisateur demande plus de détails."""
+
+_EMPTY_REPLY = "Désolé, je n'ai pas pu générer de réponse. Réessayez ou contactez le support."
+_UNAVAILABLE_REPLY = "Le service de chat est temporairement indisponible. Veuillez réessayer ou contacter support@bissoevent.com."
+
+
+class ChatStreamInterrupted(Exception):
+    """The model stream failed after part of the reply was already sent."""
+
+
+# Upper bound on the estimated prompt size sent to the model. A normal prompt
+# (system prompt, 2000-char message, capped event policies) stays around 1000
+# tokens, so only pathological docs (e.g. a huge event title or user name) are trimmed.
+MAX_PROMPT_TOKENS = 2000
+
+_CONTEXT_FRAME = "\n\n--- Contexte actuel ---\n{}\n--- Fin contexte ---"
+_CONTEXT_SEP = "\n\n"
+# An over-budget context part is cut down to fit, unless less than this would remain
+_MIN_TRIMMED_PART = 200
+
+# Event docs change rarely - reuse their formatted context across chat messages
+EVENT_CONTEXT_TTL = 60
+_event_ctx_cache: TTLCache = TTLCache(maxsize=1024, ttl=EVENT_CONTEXT_TTL)
+_event_ctx_flight: SingleFlight[str, tuple[str, str]] = SingleFlight()
+
+
+def _format_user_context(d: dict) -> str:
+    """Format a users doc for context."""
+    user_type = d.get("userType") or "attendee"
+    name = d.get("name") or d.get("email") or "Utilisateur"
+    return f"Utilisateur: {name}, type: {user_type}."
+
+
+def _format_event_context(d: dict) -> str:
+    """Format an events doc for context."""
+    title = d.get("title") or ""
+    city = d.get("city") or d.get("location") or ""
+    date = d.get("date")
+    if isinstance(date, datetime):
+        date_str = date.isoformat()
+    else:
+        date_str = str(date) if date else ""
+    price = d.get("price")
+    currency = d.get("currency") or "CDF"
+    refund = (d.get("refundPolicy") or "")[:300]
+    cancel = (d.get("cancellationPolicy") or "")[:300]
+    status = d.get("status") or "active"
+    # Skip empty fields; a price of 0 is kept since it means the event is free
+    parts = [
+        p
+        for p in (
+            title and f"Événement: {title}",
+            city and f"Ville: {city}",
+            date_str and f"Date: {date_str}",
+            price is not None and f"Prix: {price} {currency}",
+            f"Statut: {status}",
+            refund and f"Politique de remboursement: {refund}...",
+            cancel and f"Politique d'annulation: {cancel}...",
+        )
+        if p
+    ]
+    return "\n".join(parts)
+
+
+async def _fetch_docs_context(user_id: str | None, event_id: str | None) -> tuple[str, str | None]:
+    """
+    Fetch user profile and event details in one batched read.
+    Returns (user_ctx, event_ctx); event_ctx is None if the read failed.
+    """
+    if not user_id and not event_id:
+        return "", ""
+    user_ctx = event_ctx = ""
     try:
-        doc = get_db().collection("users").document(user_id).get()
-        if not doc.exists or not doc.to_dict():
-            return ""
-        d = doc.to_dict()
-        user_type = d.get("userType") or "attendee"
-        name = d.get("name") or d.get("email") or "Utilisateur"
-        return f"Utilisateur: {name}, type: {user_type}."
+        db = get_async_db()
+        refs = []
+        if user_id:
+            refs.append(db.collection("users").document(user_id))
+        if event_id:
+            refs.append(db.collection("events").document(event_id))
+        async for doc in db.get_all(refs):
+            d = doc.to_dict() if doc.exists else None
+            if not d:
+                continue
+            # get_all does not guarantee order - dispatch on the collection
+            if doc.reference.parent.id == "users":
+                user_ctx = _format_user_context(d)
+            else:
+                event_ctx = _format_event_context(d)
     except Exception as e:
-        logger.debug("Could not fetch user %s: %s", user_id, e)
-        return ""
+        logger.debug("Could not fetch user %s / event %s: %s", user_id, event_id, e)
+        return "", None
+    return user_ctx, event_ctx
 
 
-def _get_event_context(event_id: Optional[str]) -> str:
-    """Fetch event details for context."""
-    if not event_id:
-        return ""
-    try:
-        doc = get_db().collection("events").document(event_id).get()
-        if not doc.exists or not doc.to_dict():
-            return ""
-        d = doc.to_dict()
-        title = d.get("title") or ""
-        city = d.get("city") or d.get("location") or ""
-        date = d.get("date")
-        if hasattr(date, "isoformat"):
-            date_str = date.isoformat()
-        elif hasattr(date, "timestamp"):
-            date_str = datetime.fromtimestamp(date.timestamp(), tz=timezone.utc).isoformat()
+async def _get_docs_context(user_id: str | None, event_id: str | None) -> tuple[str, str]:
+    """
+    User profile and event details for context, as (user_ctx, event_ctx).
+    Event context is cached per event_id; concurrent misses for the same event share one read.
+    """
+    cached = _event_ctx_cache.get(event_id) if event_id else None
+    if cached is not None or (event_id and event_id in _event_ctx_flight):
+        # Event already known or being read by another request - only read the user doc
+        user_ctx = (await _fetch_docs_context(user_id, None))[0] if user_id else ""
+        if cached is not None:
+            event_ctx = cached
         else:
-            date_str = str(date) if date else ""
-        price = d.get("price") or 0
-        currency = d.get("currency") or "CDF"
-        refund = (d.get("refundPolicy") or "")[:300]
-        cancel = (d.get("cancellationPolicy") or "")[:300]
-        status = d.get("status") or "active"
-        parts = [
-            f"Événement: {title}",
-            f"Ville: {city}",
-            f"Date: {date_str}",
-            f"Prix: {price} {currency}",
-            f"Statut: {status}",
-        ]
-        if refund:
-            parts.append(f"Politique de remboursement: {refund}...")
-        if cancel:
-            parts.append(f"Politique d'annulation: {cancel}...")
-        return "\n".join(parts)
-    except Exception as e:
-        logger.debug("Could not fetch event %s: %s", event_id, e)
-        return ""
+            # Joins the read in flight; the leader's user context is not ours
+            event_ctx = (await _event_ctx_flight.do(event_id, lambda: _load_docs_context(None, event_id)))[1]
+    elif event_id:
+        user_ctx, event_ctx = await _event_ctx_flight.do(event_id, lambda: _load_docs_context(user_id, event_id))
+    else:
+        user_ctx, event_ctx = await _fetch_docs_context(user_id, None)
+    return user_ctx, event_ctx or ""
+
+
+async def _load_docs_context(user_id: str | None, event_id: str) -> tuple[str, str]:
+    """Batched user + event read; caches the event context unless the read failed."""
+    user_ctx, event_ctx = await _fetch_docs_context(user_id, event_id)
+    if event_ctx is None:
+        return user_ctx, ""
+    _event_ctx_cache[event_id] = event_ctx
+    return user_ctx, event_ctx
 
 
-def _get_tickets_context(user_id: Optional[str], event_id: Optional[str]) -> str:
+async def _get_tickets_context(user_id: str | None, event_id: str | None) -> str:
     """Fetch user's tickets for event (if both provided)."""
     if not user_id or not event_id:
         return ""
     try:
-        snapshot = (
-            get_db()
+        # COUNT aggregation - only the number comes back, no ticket docs
+        result = await (
+            get_async_db()
             .collection("tickets")
             .where("userId", "==", user_id)
             .where("eventId", "==", event_id)
-            .limit(5)
+            .count()
             .get()
         )
-        if not snapshot:
+        count = int(result[0][0].value) if result else 0
+        if not count:
             return ""
-        count = len(snapshot.docs)
         return f"L'utilisateur a {count} billet(s) pour cet événement."
     except Exception as e:
         logger.debug("Could not fetch tickets: %s", e)
         return ""
 
 
-def _build_system_prompt(lang: str) -> str:
-    lang_name = LANGUAGES.get(lang or "fr", "French")
-    return f"""Tu es l'assistant de support de BissoEvent, une application de billetterie et d'événements en Afrique (RD Congo, Congo, etc.).
+@lru_cache(maxsize=len(LANGUAGES))
+def _build_system_prompt(lang_name: str) -> str:
+    """Render the system prompt for a resolved language name (cached - one entry per language)."""
+    return _SYSTEM_PROMPT.format(lang_name=lang_name)
 
-Réponds TOUJOURS en {lang_name}.
 
-Tu peux aider sur:
-- Réservation de billets, paiement (Mobile Money, carte)
-- Remboursements et annulations (politiques de l'événement)
-- Informations sur les événements (date, lieu, prix)
-- Compte organisateur (création d'événements, ventes)
-- Problèmes techniques (application, QR codes)
-
-Si tu ne connais pas la réponse ou si c'est hors de ton scope (ex: litige juridique), dis poliment de contacter le support: support@bissoevent.com ou via l'app.
-
-Sois concis, utile et courtois. Maximum 3-4 phrases sauf si l'utilisateur demande plus de détails."""
-
-
-def chat(
-    message: str,
-    user_id: Optional[str] = None,
-    event_id: Optional[str] = None,
-    user_type: Optional[str] = None,
-    language: Optional[str] = "fr",
-) -> dict:
+def _fit_context(parts: list[str], budget: int) -> list[str]:
     """
-    Process a chat message and return an AI reply.
-    Loads context from Firestore (user, event, tickets) for personalized answers.
+    Shrink context parts until they fit in budget characters. The largest part
+    (usually an oversized doc) is cut down first, or dropped if too little of it
+    would remain, so the short lines (user type, user, tickets) survive.
     """
-    user_ctx = _get_user_context(user_id)
-    event_ctx = _get_event_context(event_id)
-    tickets_ctx = _get_tickets_context(user_id, event_id)
+    parts = list(parts)
+    while parts:
+        excess = len(_CONTEXT_SEP.join(parts)) - budget
+        if excess <= 0:
+            break
+        i = max(range(len(parts)), key=lambda j: len(parts[j]))
+        keep = len(parts[i]) - excess - 3
+        if keep >= _MIN_TRIMMED_PART:
+            parts[i] = parts[i][:keep] + "..."
+        else:
+            del parts[i]
+    return parts
 
+
+async def _build_messages(
+    message: str,
+    user_id: str | None,
+    event_id: str | None,
+    user_type: str | None,
+    language: str | None,
+) -> list[dict]:
+    """Build the OpenAI messages, loading context from Firestore (user, event, tickets)."""
+    # Resolve first so unknown codes share the default entry instead of filling the cache
+    system_content = _build_system_prompt(language_name(language))
     # user_type from request can override/supplement user doc
     type_ctx = f"Type utilisateur indiqué: {user_type}." if user_type else ""
-    context_parts = [p for p in [type_ctx, user_ctx, event_ctx, tickets_ctx] if p]
-    context_block = "\n\n".join(context_parts) if context_parts else "Aucun contexte utilisateur/événement fourni."
 
-    system_content = _build_system_prompt(language)
-    system_content += f"\n\n--- Contexte actuel ---\n{context_block}\n--- Fin contexte ---"
+    # Context lookups are independent - run them concurrently, and only those
+    # whose IDs are present. User and event docs share one batched read;
+    # tickets is a query so it runs alongside.
+    user_ctx = event_ctx = tickets_ctx = ""
+    if user_id and event_id:
+        (user_ctx, event_ctx), tickets_ctx = await asyncio.gather(
+            _get_docs_context(user_id, event_id),
+            _get_tickets_context(user_id, event_id),
+        )
+    elif user_id or event_id:
+        user_ctx, event_ctx = await _get_docs_context(user_id, event_id)
+    context_parts = [p for p in (type_ctx, user_ctx, event_ctx, tickets_ctx) if p]
+
+    # Rough token estimate (~4 chars/token) of everything sent; shrink the context
+    # rather than pay for an LLM round trip that would fail or be truncated
+    budget = MAX_PROMPT_TOKENS * 4 - len(system_content) - len(message) - len(_CONTEXT_FRAME.format(""))
+    context_parts = _fit_context(context_parts, budget)
+    context_block = _CONTEXT_SEP.join(context_parts) if context_parts else "Aucun contexte utilisateur/événement fourni."
+
+    system_content += _CONTEXT_FRAME.format(context_block)
 
-    messages = [
+    return [
         {"role": "system", "content": system_content},
         {"role": "user", "content": message},
     ]
 
+
+async def chat(
+    message: str,
+    user_id: str | None = None,
+    event_id: str | None = None,
+    user_type: str | None = None,
+    language: str | None = "fr",
+) -> dict:
+    """
+    Process a chat message and return an AI reply.
+    Loads context from Firestore (user, event, tickets) for personalized answers.
+    """
+    messages = await _build_messages(message, user_id, event_id, user_type, language)
+
     try:
-        response = client.chat.completions.create(
+        response = await get_openai().chat.completions.create(
             model="gpt-4o-mini",
             messages=messages,
             max_tokens=500,
             temperature=0.7,
         )
-        reply = response.choices[0].message.content or "Désolé, je n'ai pas pu générer de réponse. Réessayez ou contactez le support."
+        reply = response.choices[0].message.content or _EMPTY_REPLY
         return {"reply": reply.strip(), "conversation_id": None}
     except Exception as e:
         logger.exception("Chat LLM error: %s", e)
         return {
-            "reply": "Le service de chat est temporairement indisponible. Veuillez réessayer ou contacter support@bissoevent.com.",
+            "reply": _UNAVAILABLE_REPLY,
             "conversation_id": None,
         }
+
+
+async def chat_stream(
+    message: str,
+    user_id: str | None = None,
+    event_id: str | None = None,
+    user_type: str | None = None,
+    language: str | None = "fr",
+) -> AsyncIterator[str]:
+    """
+    Same as chat(), but yields the reply text in chunks as the model produces them.
+    Raises ChatStreamInterrupted if the model fails after part of the reply was yielded.
+    """
+    messages = await _build_messages(message, user_id, event_id, user_type, language)
+
+    empty = True
+    try:
+        stream = await get_openai().chat.completions.create(
+            model="gpt-4o-mini",
+            messages=messages,
+            max_tokens=500,
+            temperature=0.7,
+            stream=True,
+        )
+        # Closing releases the upstream HTTP/2 stream back to the shared pool,
+        # also when the client disconnects and this generator is cancelled
+        async with stream:
+            async for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    empty = False
+                    yield delta
+    except Exception as e:
+        logger.exception("Chat LLM stream error: %s", e)
+        if not empty:
+            # Don't glue the fallback text onto a partial answer
+            raise ChatStreamInterrupted from e
+        yield _UNAVAILABLE_REPLY
+        return
+    if empty:
+        yield _EMPTY_REPLY
@@ -1,12 +1,34 @@
 """Firestore client for content-service."""
+from datetime import datetime
 from functools import lru_cache
+from typing import Any
 
 from google.cloud import firestore
+from google.cloud.firestore_v1.base_document import BaseDocumentReference
 
-from app.core.config import settings
+from app.core.config import get_settings
 
 
 @lru_cache(maxsize=1)
-def get_db() -> firestore.Client:
-    """Get Firestore client (cached singleton)."""
-    return firestore.Client(project=settings.GOOGLE_CLOUD_PROJECT)
+def get_async_db() -> firestore.AsyncClient:
+    """
+    Get async Firestore client (cached singleton) for use inside the event loop.
+    All callers share its gRPC channel, which the SDK opens with keepalive
+    (grpc.keepalive_time_ms=30000) - call this freely, there is nothing to re-cache.
+    """
+    return firestore.AsyncClient(project=get_settings().GOOGLE_CLOUD_PROJECT)
+
+
+def firestore_json_default(val: Any) -> Any:
+    """orjson `default` hook for Firestore values orjson cannot encode natively."""
+    # Timestamps are DatetimeWithNanoseconds; orjson only handles exact datetimes
+    if isinstance(val, datetime):
+        return val.isoformat()
+    if isinstance(val, firestore.GeoPoint):
+        return {"latitude": val.latitude, "longitude": val.longitude}
+    if isinstance(val, BaseDocumentReference):
+        return val.path
+    # Blob fields - decoded as text, like FastAPI's jsonable_encoder did
+    if isinstance(val, bytes):
+        return val.decode(errors="replace")
+    raise TypeError
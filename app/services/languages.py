@@ -0,0 +1,9 @@
+"""Languages supported in AI prompts."""
+
+LANGUAGES = {"fr": "French", "en": "English", "sw": "Swahili"}
+DEFAULT_LANGUAGE = "French"
+
+
+def language_name(code: str | None) -> str:
+    """Map a language code to its prompt name, falling back to French."""
+    return LANGUAGES.get(code, DEFAULT_LANGUAGE) if code else DEFAULT_LANGUAGE
@@ -1,4 +1,42 @@
-from openai import OpenAI
-from app.core.config import settings
+from functools import lru_cache
 
-client = OpenAI(api_key=settings.OPENAI_API_KEY)
\ No newline at end of file
+import httpx
+from openai import AsyncOpenAI
+from app.core.config import get_settings
+
+
+class InvalidAPIKeyError(ValueError):
+    """OPENAI_API_KEY contains characters that are illegal in an HTTP header (e.g. a trailing newline)."""
+
+
+@lru_cache(maxsize=1)
+def get_openai() -> AsyncOpenAI:
+    """Get OpenAI client (cached singleton), created on first use. Raises InvalidAPIKeyError for a malformed key."""
+    key = get_settings().OPENAI_API_KEY
+    # Checked here, before anything is sent: the HTTP/2 transport does not reject
+    # a newline in a header value, so it would surface as an opaque remote error
+    if "\n" in key or "\r" in key:
+        raise InvalidAPIKeyError("OPENAI_API_KEY contains a newline or carriage return")
+    # Shared pooled HTTP/2 transport - reuses TLS connections across requests
+    http_client = httpx.AsyncClient(
+        http2=True,
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=50, keepalive_expiry=30),
+        timeout=httpx.Timeout(30.0, connect=5.0),
+    )
+    return AsyncOpenAI(api_key=key, http_client=http_client)
+
+
+async def close_openai() -> None:
+    """Close the OpenAI connection pool if the client was ever created."""
+    if get_openai.cache_info().currsize:
+        await get_openai().close()
+        get_openai.cache_clear()
+
+
+def is_invalid_header_error(exc: BaseException) -> bool:
+    """True if the API key is unusable as a header value (e.g. newline in the API key)."""
+    if isinstance(exc, InvalidAPIKeyError):
+        return True
+    # HTTP/1.1 fallback: h11 rejects the header locally, and openai wraps that
+    # in APIConnectionError, keeping the httpx error as __cause__
+    return isinstance(exc, httpx.LocalProtocolError) or isinstance(exc.__cause__, httpx.LocalProtocolError)
@@ -3,135 +3,189 @@ Event recommendation service.
 Uses userInterestProfiles (AI & personalization) and eventAnalytics (trending).
 Falls back to trending when user has no profile.
 """
+import asyncio
+import heapq
 import logging
+import os
+import time
 from datetime import datetime, timezone
 from typing import Any
 
-from app.services.firestore_client import get_db
+from cachetools import TTLCache
+
+from app.services.firestore_client import get_async_db
+from app.services.singleflight import SingleFlight
 
 logger = logging.getLogger(__name__)
 
 MAX_RECOMMENDATIONS = 10
 MAX_CANDIDATES = 100
 
+# eventAnalytics fields read by trending scoring - analytics reads fetch only these
+ANALYTICS_FIELDS = ["views", "favorites", "shares", "conversionRate"]
 
-def _serialize_doc(doc: Any) -> dict | None:
-    """Convert Firestore doc to JSON-serializable dict."""
-    if not doc or not doc.exists:
-        return None
-    data = doc.to_dict()
-    if data is None:
-        return None
-    out = {"id": doc.id, **_serialize_value(data)}
-    return out
+# Derived fields added at ingest; stripped before events are returned
+_INTERNAL_FIELDS = frozenset({"_dt_ts", "_city"})
+
+# Caches below are only touched from the event loop, so they need no locks.
+
+# Profiles and analytics change on the order of minutes - cache them in-process (seconds)
+PROFILE_CACHE_TTL = int(os.getenv("PROFILE_CACHE_TTL", "300"))
+ANALYTICS_CACHE_TTL = int(os.getenv("ANALYTICS_CACHE_TTL", "300"))
+_profile_cache: TTLCache = TTLCache(maxsize=10_000, ttl=PROFILE_CACHE_TTL)
+_analytics_cache: TTLCache = TTLCache(maxsize=10_000, ttl=ANALYTICS_CACHE_TTL)
+_MISSING = object()
+
+# Candidate events are shared across users - {limit: (fetched_at, events)}
+EVENTS_CACHE_TTL = int(os.getenv("EVENTS_CACHE_TTL", "30"))
+_events_cache: dict[int, tuple[float, list[dict]]] = {}
+_events_flight: SingleFlight[int, list[dict]] = SingleFlight()
 
+# Identical concurrent requests share one computation - keyed by (user_id, limit)
+_recommend_flight: SingleFlight[tuple[str | None, int], dict] = SingleFlight()
 
-def _serialize_value(val: Any) -> Any:
-    """Recursively serialize Firestore values."""
-    if val is None:
-        return None
-    if hasattr(val, "isoformat"):
-        return val.isoformat()
-    if hasattr(val, "timestamp"):
-        return datetime.fromtimestamp(val.timestamp(), tz=timezone.utc).isoformat()
-    if isinstance(val, dict):
-        return {k: _serialize_value(v) for k, v in val.items()}
-    if isinstance(val, list):
-        return [_serialize_value(v) for v in val]
-    return val
-
-
-def _parse_event_date(event: dict) -> datetime | None:
-    """Parse event date for comparison."""
-    d = event.get("date")
-    if d is None:
-        return None
-    if isinstance(d, datetime):
-        return d
-    if hasattr(d, "timestamp"):
-        return datetime.fromtimestamp(d.timestamp(), tz=timezone.utc)
-    if isinstance(d, str):
+
+def _normalize_weights(raw: Any) -> dict[str, float]:
+    """{key: weight} with stripped, lowercased keys and float weights; bad entries dropped."""
+    if not isinstance(raw, dict):
+        return {}
+    out: dict[str, float] = {}
+    for k, v in raw.items():
         try:
-            return datetime.fromisoformat(d.replace("Z", "+00:00"))
-        except (ValueError, TypeError):
-            return None
-    return None
+            out[str(k).strip().lower()] = float(v)
+        except (TypeError, ValueError):
+            continue
+    return out
+
 
+def _normalize_profile(data: dict) -> dict:
+    """Preprocess a profile once at load so scoring does plain dict lookups."""
+    return {
+        **data,
+        "topCategories": _normalize_weights(data.get("topCategories")),
+        "topCities": _normalize_weights(data.get("topCities")),
+    }
 
-def get_user_interest_profile(user_id: str) -> dict | None:
-    """Fetch userInterestProfiles doc. Returns None if missing or empty."""
+
+async def get_user_interest_profile(user_id: str) -> dict | None:
+    """Fetch userInterestProfiles doc, normalized and TTL-cached. Returns None if missing or empty."""
+    cached = _profile_cache.get(user_id, _MISSING)
+    if cached is not _MISSING:
+        return cached
     try:
-        doc = get_db().collection("userInterestProfiles").document(user_id).get()
-        if not doc.exists:
-            return None
-        data = doc.to_dict()
-        if not data:
-            return None
-        return data
+        doc = await get_async_db().collection("userInterestProfiles").document(user_id).get()
+        data = doc.to_dict() if doc.exists else None
+        profile = _normalize_profile(data) if data else None
     except Exception as e:
         logger.warning("Failed to fetch userInterestProfiles for %s: %s", user_id, e)
-        return None
+        return None  # don't cache failures
+    _profile_cache[user_id] = profile
+    return profile
 
 
-def get_event_analytics(event_ids: list[str]) -> dict[str, dict]:
-    """Fetch eventAnalytics for given event IDs. Returns {eventId: analytics_dict}."""
+async def get_event_analytics(event_ids: list[str]) -> dict[str, dict]:
+    """Fetch eventAnalytics for given event IDs (TTL-cached per event). Returns {eventId: analytics_dict}."""
     if not event_ids:
         return {}
     result: dict[str, dict] = {}
-    db = get_db()
-    for eid in event_ids[:50]:
-        try:
-            doc = db.collection("eventAnalytics").document(eid).get()
-            if doc.exists and doc.to_dict():
-                result[eid] = doc.to_dict()
-        except Exception as e:
-            logger.debug("Failed to fetch eventAnalytics for %s: %s", eid, e)
+    missing: list[str] = []
+    for eid in event_ids[:MAX_CANDIDATES]:
+        cached = _analytics_cache.get(eid)
+        if cached is None:
+            missing.append(eid)
+        elif cached:
+            result[eid] = cached
+    if not missing:
+        return result
+
+    # Events without an analytics doc are cached as {} so they are not re-read
+    fetched: dict[str, dict] = {eid: {} for eid in missing}
+    try:
+        db = get_async_db()
+        refs = [db.collection("eventAnalytics").document(eid) for eid in missing]
+        # One batched RPC instead of a round trip per event
+        async for doc in db.get_all(refs, field_paths=ANALYTICS_FIELDS):
+            data = doc.to_dict() if doc.exists else None
+            if data:
+                fetched[doc.id] = data
+    except Exception as e:
+        logger.warning("Failed to fetch eventAnalytics: %s", e)
+        return result  # don't cache failures
+    _analytics_cache.update(fetched)
+    result.update((eid, data) for eid, data in fetched.items() if data)
     return result
 
 
-def get_upcoming_events(limit: int = MAX_CANDIDATES) -> list[dict]:
-    """Fetch active, public, upcoming events."""
+async def _query_upcoming_events(limit: int) -> list[dict]:
+    """Query active, public, upcoming events from Firestore. Raises on failure."""
     now = datetime.now(timezone.utc)
     events: list[dict] = []
+    # Firestore: status==active, isPublic==true, date>=now (soonest first).
+    # Needs the composite index events(status, isPublic, date) - see DEPLOY.md.
+    # The range filter only matches timestamp dates: legacy events without a date,
+    # or with a string date, are intentionally excluded and must be migrated.
+    # Full docs, not a projection: the cached candidates double as the response payload.
+    q = (
+        get_async_db()
+        .collection("events")
+        .where("status", "==", "active")
+        .where("isPublic", "==", True)
+        .where("date", ">=", now)
+        .order_by("date")
+        .limit(limit)
+    )
+    async for doc in q.stream():
+        data = doc.to_dict()
+        if data is None:
+            continue
+        # date is always a timestamp here (see the range filter above); sorting reuses it
+        ts = data["date"].timestamp()
+        # City match key, derived once here instead of per scoring call
+        city = data.get("city") or (data.get("location") or "").split(",", 1)[0]
+        city = city.strip().lower() if isinstance(city, str) else ""
+        events.append({"id": doc.id, **data, "_dt_ts": ts, "_city": city})
+    return events
+
+
+async def get_upcoming_events(limit: int = MAX_CANDIDATES) -> list[dict]:
+    """
+    Fetch active, public, upcoming events.
+    The result is the same for every caller, so it is cached for EVENTS_CACHE_TTL
+    seconds and concurrent misses share a single query. Treat it as read-only.
+    """
+    cached = _events_cache.get(limit)
+    if cached and time.monotonic() - cached[0] < EVENTS_CACHE_TTL:
+        return cached[1]
+    return await _events_flight.do(limit, lambda: _load_upcoming_events(limit))
+
+
+async def _load_upcoming_events(limit: int) -> list[dict]:
+    """Query upcoming events and cache them. Returns [] on failure (not cached)."""
     try:
-        # Firestore: status==active
-        q = (
-            get_db()
-            .collection("events")
-            .where("status", "==", "active")
-            .limit(limit)
-        )
-        for doc in q.stream():
-            data = doc.to_dict()
-            if data is None:
-                continue
-            if data.get("isPublic") is False:
-                continue
-            event_dt = _parse_event_date(data)
-            if event_dt and event_dt < now:
-                continue  # Skip past events
-            events.append({"id": doc.id, **data})
+        events = await _query_upcoming_events(limit)
     except Exception as e:
         logger.warning("Failed to fetch events: %s", e)
+        return []
+    _events_cache[limit] = (time.monotonic(), events)
     return events
 
 
 def score_event_with_profile(event: dict, profile: dict) -> float:
-    """Score event based on userInterestProfiles."""
+    """Score event based on userInterestProfiles (normalized by _normalize_profile)."""
     score = 0.0
     top_categories = profile.get("topCategories") or {}
     top_cities = profile.get("topCities") or {}
     price_pref = profile.get("pricePreference")
 
-    # Category match
+    # Category match (profile keys are lowercased, so "Music" matches "music")
     cat = event.get("category") or event.get("categoryName")
-    if cat and cat in top_categories:
-        score += float(top_categories.get(cat, 0))
+    if cat and isinstance(cat, str):
+        score += top_categories.get(cat.strip().lower(), 0.0)
 
-    # City match
-    city = event.get("city") or (event.get("location") or "").split(",")[0].strip()
-    if city and city in top_cities:
-        score += float(top_cities.get(city, 0))
+    # City match (_city is lowercased at ingest)
+    city = event.get("_city")
+    if city:
+        score += top_cities.get(city, 0.0)
 
     # Price preference
     price = event.get("price")
@@ -163,60 +217,56 @@ def score_event_trending(event: dict, analytics: dict[str, dict]) -> float:
     return views * 0.1 + favorites * 2 + shares * 1.5 + conversion * 10
 
 
-def recommend_events(user_id: str | None = None, limit: int = MAX_RECOMMENDATIONS) -> dict:
+def _sort_key(item: tuple[dict, float]) -> tuple[float, float]:
+    """Higher score first; same score -> sooner date first (with reverse=True)."""
+    e, s = item
+    return (s, -e["_dt_ts"])
+
+
+async def recommend_events(user_id: str | None = None, limit: int = MAX_RECOMMENDATIONS) -> dict:
     """
     Get personalized or trending event recommendations.
     - If user_id and userInterestProfiles exists: score by topCategories, topCities, pricePreference
     - Else: use eventAnalytics (trending)
     - Excludes past events
+    Concurrent calls with the same arguments share one result. Treat it as read-only.
     """
-    events = get_upcoming_events(limit=MAX_CANDIDATES)
+    return await _recommend_flight.do((user_id or None, limit), lambda: _recommend_events(user_id, limit))
+
+
+async def _recommend_events(user_id: str | None, limit: int) -> dict:
+    """Compute recommendations for recommend_events (one run per in-flight key)."""
+    # Events and profile are independent reads - issue them together. Analytics
+    # is only read for the trending branch, so it waits for the profile.
+    events_task = asyncio.create_task(get_upcoming_events(MAX_CANDIDATES))
+    profile_task = asyncio.create_task(get_user_interest_profile(user_id)) if user_id else None
+    events = await events_task
     if not events:
+        if profile_task:
+            profile_task.cancel()
         return {"events": [], "source": "none"}
 
-    profile = get_user_interest_profile(user_id) if user_id else None
-    analytics = get_event_analytics([e.get("id") for e in events if e.get("id")])
+    profile = await profile_task if profile_task else None
+    use_personalized = bool(profile and (profile.get("topCategories") or profile.get("topCities")))
 
-    # Filter past events
-    now = datetime.now(timezone.utc)
-    events = [e for e in events if (_parse_event_date(e) or now) >= now]
-
-    if profile and (profile.get("topCategories") or profile.get("topCities")):
+    if use_personalized:
         # Personalized scoring
         scored = [
             (e, score_event_with_profile(e, profile))
             for e in events
         ]
-        # Sort by score desc, then by date asc (soonest first)
-        def _sort_key(item):
-            e, s = item
-            d = _parse_event_date(e)
-            ts = d.timestamp() if d else float("inf")
-            return (s, -ts)  # higher score first; same score -> sooner date first
-
-        scored.sort(key=_sort_key, reverse=True)
         source = "personalized"
     else:
         # Trending fallback (secondary sort by date when no analytics)
-        scored = [
-            (e, score_event_trending(e, analytics))
-            for e in events
-        ]
-
-        def _sort_key(item):
-            e, s = item
-            d = _parse_event_date(e)
-            ts = d.timestamp() if d else float("inf")
-            return (s, -ts)
-
-        scored.sort(key=_sort_key, reverse=True)
+        analytics = await get_event_analytics([e.get("id") for e in events if e.get("id")])
+        scored = [(e, score_event_trending(e, analytics)) for e in events]
         source = "trending"
 
-    # Take top N, serialize for response
-    recommended = [e for e, _ in scored[:limit]]
-    out = [
-        _serialize_value({**e, "id": e.get("id")})
-        for e in recommended
-    ]
+    # Top N by score desc, then by date asc (soonest first) - no full sort needed
+    recommended = [e for e, _ in heapq.nlargest(limit, scored, key=_sort_key)]
+
+    # Candidates are full docs, so a warm cache answers without any Firestore read.
+    # Raw Firestore values are kept - the route encodes them with firestore_json_default
+    out = [{k: v for k, v in e.items() if k not in _INTERNAL_FIELDS} for e in recommended]
 
     return {"events": out, "source": source}
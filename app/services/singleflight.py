@@ -0,0 +1,44 @@
+"""
+Single-flight request coalescing.
+Concurrent calls for the same key share one in-flight task instead of repeating the work.
+"""
+import asyncio
+from collections.abc import Awaitable, Callable, Hashable
+from typing import Generic, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+T = TypeVar("T")
+
+
+class SingleFlight(Generic[K, T]):
+    """
+    Coalesce concurrent calls per key. Only touched from the event loop, so no locks.
+    The shared result is returned to every caller as-is - treat it as read-only.
+    """
+
+    def __init__(self) -> None:
+        self._inflight: dict[K, asyncio.Task] = {}
+
+    def __contains__(self, key: K) -> bool:
+        """True while a call for key is in flight."""
+        return key in self._inflight
+
+    async def do(self, key: K, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        Await fn() for key, or join the call already in flight for it.
+        Errors reach every waiter. A waiter being cancelled (e.g. a client
+        disconnect) does not cancel the shared work for the others.
+        """
+        task = self._inflight.get(key)
+        if task is None:
+            task = self._inflight[key] = asyncio.ensure_future(fn())
+            task.add_done_callback(lambda t: self._done(key, t))
+        return await asyncio.shield(task)
+
+    def _done(self, key: K, task: asyncio.Task) -> None:
+        """Forget the finished call so the next one starts fresh."""
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark the error as retrieved in case every waiter was cancelled
+        if not task.cancelled():
+            task.exception()
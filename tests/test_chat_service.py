@@ -0,0 +1,79 @@
+"""Tests for chat prompt assembly and the prompt-size guard."""
+import asyncio
+
+import pytest
+
+from app.services import chat_service
+
+TYPE_LINE = "Type utilisateur indiqué: organizer."
+USER_LINE = "Utilisateur: Ana, type: organizer."
+TICKETS_LINE = "L'utilisateur a 2 billet(s) pour cet événement."
+
+
+def _build(monkeypatch, event_ctx: str, message: str = "Bonjour") -> list[dict]:
+    """Run _build_messages with stubbed Firestore lookups."""
+
+    async def docs(user_id, event_id):
+        return USER_LINE, event_ctx
+
+    async def tickets(user_id, event_id):
+        return TICKETS_LINE
+
+    monkeypatch.setattr(chat_service, "_get_docs_context", docs)
+    monkeypatch.setattr(chat_service, "_get_tickets_context", tickets)
+    return asyncio.run(chat_service._build_messages(message, "u1", "e1", "organizer", "fr"))
+
+
+def _prompt_chars(messages: list[dict]) -> int:
+    return sum(len(m["content"]) for m in messages)
+
+
+def test_normal_context_is_kept(monkeypatch):
+    event_ctx = "Événement: Concert\nPolitique de remboursement: " + "r" * 300 + "..."
+    messages = _build(monkeypatch, event_ctx, "m" * 2000)
+
+    system = messages[0]["content"]
+    for part in (TYPE_LINE, USER_LINE, event_ctx, TICKETS_LINE):
+        assert part in system
+    assert messages[1]["content"] == "m" * 2000
+
+
+def test_oversized_event_is_trimmed_and_short_lines_are_kept(monkeypatch):
+    huge_event_ctx = "Événement: " + "x" * 10_000
+    messages = _build(monkeypatch, huge_event_ctx)
+
+    system = messages[0]["content"]
+    for part in (TYPE_LINE, USER_LINE, TICKETS_LINE):
+        assert part in system
+    assert "Événement: xxx" in system
+    assert huge_event_ctx not in system
+    assert _prompt_chars(messages) <= chat_service.MAX_PROMPT_TOKENS * 4
+
+
+@pytest.mark.parametrize("message_len", [1, 2000])
+def test_message_is_never_trimmed(monkeypatch, message_len):
+    message = "m" * message_len
+    messages = _build(monkeypatch, "y" * 20_000, message)
+
+    assert messages[1]["content"] == message
+    assert _prompt_chars(messages) <= chat_service.MAX_PROMPT_TOKENS * 4
+
+
+def test_fit_context_cuts_the_largest_part():
+    parts = ["short", "z" * 1000, "tail"]
+    fitted = chat_service._fit_context(parts, 600)
+
+    assert fitted[0] == "short" and fitted[2] == "tail"
+    assert fitted[1].endswith("...")
+    assert len("\n\n".join(fitted)) <= 600
+
+
+def test_fit_context_drops_a_part_that_cannot_be_usefully_trimmed():
+    fitted = chat_service._fit_context(["short", "z" * 1000], 150)
+
+    assert fitted == ["short"]
+
+
+def test_fit_context_leaves_fitting_parts_alone():
+    parts = ["a", "b"]
+    assert chat_service._fit_context(parts, 100) == parts
@@ -0,0 +1,30 @@
+"""Tests for the recommendation pipeline."""
+import asyncio
+import time
+
+from app.services import recommender
+
+
+def _no_firestore():
+    raise AssertionError("unexpected Firestore read")
+
+
+def test_warm_cache_answers_with_full_docs_and_no_reads(monkeypatch):
+    event = {
+        "id": "ev1",
+        "title": "Concert",
+        "description": "Full doc field",
+        "category": "music",
+        "_dt_ts": 1.0,
+        "_city": "kinshasa",
+    }
+    monkeypatch.setattr(recommender, "_events_cache", {recommender.MAX_CANDIDATES: (time.monotonic(), [event])})
+    monkeypatch.setitem(recommender._profile_cache, "u1", {"topCategories": {"music": 1.0}, "topCities": {}})
+    monkeypatch.setattr(recommender, "get_async_db", _no_firestore)
+
+    result = asyncio.run(recommender.recommend_events("u1", 5))
+
+    assert result == {
+        "events": [{"id": "ev1", "title": "Concert", "description": "Full doc field", "category": "music"}],
+        "source": "personalized",
+    }
@@ -0,0 +1,155 @@
+"""Tests for single-flight coalescing and the caches built on it."""
+import asyncio
+
+import pytest
+
+from app.services import chat_service, recommender
+from app.services.singleflight import SingleFlight
+
+
+def test_concurrent_misses_share_one_call():
+    calls = 0
+
+    async def load():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"value": calls}
+
+    async def main():
+        flight = SingleFlight()
+        results = await asyncio.gather(*(flight.do("k", load) for _ in range(10)))
+        assert "k" not in flight
+        return results
+
+    results = asyncio.run(main())
+    assert calls == 1
+    assert all(r is results[0] for r in results)
+
+
+def test_different_keys_run_separately():
+    async def main():
+        flight = SingleFlight()
+        return await asyncio.gather(flight.do(1, lambda: asyncio.sleep(0, "a")), flight.do(2, lambda: asyncio.sleep(0, "b")))
+
+    assert asyncio.run(main()) == ["a", "b"]
+
+
+def test_leader_failure_reaches_every_waiter_and_is_not_kept():
+    calls = 0
+
+    async def fail():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        raise RuntimeError("boom")
+
+    async def main():
+        flight = SingleFlight()
+        results = await asyncio.gather(*(flight.do("k", fail) for _ in range(3)), return_exceptions=True)
+        assert "k" not in flight
+        # The next call starts a fresh attempt
+        assert await flight.do("k", lambda: asyncio.sleep(0, "ok")) == "ok"
+        return results
+
+    results = asyncio.run(main())
+    assert calls == 1
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+def test_cancelled_leader_does_not_cancel_other_waiters():
+    async def load():
+        await asyncio.sleep(0.02)
+        return "done"
+
+    async def main():
+        flight = SingleFlight()
+        leader = asyncio.create_task(flight.do("k", load))
+        follower = asyncio.create_task(flight.do("k", load))
+        await asyncio.sleep(0)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        assert await follower == "done"
+        await asyncio.sleep(0)
+        assert "k" not in flight
+
+    asyncio.run(main())
+
+
+def test_upcoming_events_concurrent_misses_share_one_query(monkeypatch):
+    queries = 0
+
+    async def query(limit):
+        nonlocal queries
+        queries += 1
+        await asyncio.sleep(0.01)
+        return [{"id": "ev1"}]
+
+    monkeypatch.setattr(recommender, "_query_upcoming_events", query)
+    monkeypatch.setattr(recommender, "_events_cache", {})
+
+    async def main():
+        return await asyncio.gather(*(recommender.get_upcoming_events(7) for _ in range(5)))
+
+    assert asyncio.run(main()) == [[{"id": "ev1"}]] * 5
+    assert queries == 1
+
+
+def test_upcoming_events_failure_is_not_cached(monkeypatch):
+    async def query(limit):
+        raise RuntimeError("firestore down")
+
+    monkeypatch.setattr(recommender, "_query_upcoming_events", query)
+    monkeypatch.setattr(recommender, "_events_cache", {})
+
+    async def main():
+        return await asyncio.gather(*(recommender.get_upcoming_events(7) for _ in range(3)))
+
+    assert asyncio.run(main()) == [[], [], []]
+    assert recommender._events_cache == {}
+
+
+def test_recommendations_for_same_arguments_share_one_computation(monkeypatch):
+    runs = 0
+
+    async def compute(user_id, limit):
+        nonlocal runs
+        runs += 1
+        await asyncio.sleep(0.01)
+        return {"events": [], "source": "trending"}
+
+    monkeypatch.setattr(recommender, "_recommend_events", compute)
+
+    async def main():
+        return await asyncio.gather(
+            recommender.recommend_events(None, 5),
+            recommender.recommend_events("", 5),
+            recommender.recommend_events("u1", 5),
+        )
+
+    asyncio.run(main())
+    assert runs == 2  # anonymous callers coalesce; u1 runs separately
+
+
+def test_event_context_concurrent_misses_share_one_event_read(monkeypatch):
+    reads = []
+
+    async def fetch(user_id, event_id):
+        reads.append((user_id, event_id))
+        await asyncio.sleep(0.01)
+        return (f"user {user_id}" if user_id else ""), ("event ctx" if event_id else "")
+
+    monkeypatch.setattr(chat_service, "_fetch_docs_context", fetch)
+    monkeypatch.setattr(chat_service, "_event_ctx_cache", {})
+
+    async def main():
+        return await asyncio.gather(
+            chat_service._get_docs_context("u1", "e1"),
+            chat_service._get_docs_context("u2", "e1"),
+        )
+
+    leader, follower = asyncio.run(main())
+    assert leader == ("user u1", "event ctx")
+    assert follower == ("user u2", "event ctx")
+    assert [r for r in reads if r[1]] == [("u1", "e1")]